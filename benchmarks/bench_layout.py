@@ -0,0 +1,92 @@
+"""Memory and attribute-access benchmarks for PRef and System layouts on
+large generated systems, compared against the previous (dict-based)
+representations.
+
+Run with `python benchmarks/bench_layout.py [n_keys]`.
+"""
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+
+from pyrsistent import pmap
+
+from pyntegrant.map import PRef, is_reflike
+from pyntegrant.system import System
+
+
+@dataclass(eq=True, frozen=True)
+class DictPRef:
+    """PRef as it was before slots and interning"""
+
+    key: str
+
+
+class DictSystem(object):
+    """System as it was before slotted storage"""
+
+    def __init__(self, built_config, original_config):
+        self.__dict__.update(**built_config)
+        self._original_config = original_config
+
+
+def allocated(f):
+    """Memory still allocated after calling f, and its result"""
+    tracemalloc.start()
+    result = f()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def per_call(stmt, namespace, number=200_000):
+    best = min(timeit.repeat(stmt, globals=namespace, number=number, repeat=5))
+    return best / number * 1e9
+
+
+def bench_refs(n_keys: int, refs_per_key: int = 8):
+    keys = [f"k{i}" for i in range(n_keys)]
+    make = lambda cls: [
+        cls(keys[(i + j) % n_keys]) for i in range(n_keys) for j in range(refs_per_key)
+    ]
+    keep = [PRef(k) for k in keys]  # the interned refs, as held by a config
+    for cls in (DictPRef, PRef):
+        size, refs = allocated(lambda: make(cls))
+        print(f"{cls.__name__:>10}: {len(refs)} refs, {size / len(refs):.1f} bytes/ref")
+    ns = dict(
+        is_reflike=is_reflike,
+        old=DictPRef("k0"),
+        new=PRef("k0"),
+        PRef=PRef,
+        DictPRef=DictPRef,
+    )
+    for label, stmt in [
+        ("is_reflike(DictPRef)", "is_reflike(old)"),
+        ("is_reflike(PRef)", "is_reflike(new)"),
+        ("DictPRef(key)", "DictPRef('k0')"),
+        ("PRef(key) (interned)", "PRef('k0')"),
+    ]:
+        print(f"  {label:<22}{per_call(stmt, ns):.0f} ns")
+    del keep
+
+
+def bench_system(n_keys: int):
+    built = pmap({f"k{i}": i for i in range(n_keys)})
+    for cls in (DictSystem, System):
+        # build twice so that the one-off System layout class is not counted
+        cls(built, {})
+        size, system = allocated(lambda: cls(built, {}))
+        ns = dict(system=system)
+        access = per_call(f"system.k{n_keys // 2}", ns)
+        print(
+            f"{cls.__name__:>10}: {size / n_keys:.1f} bytes/key,"
+            f" attribute access {access:.0f} ns"
+        )
+
+
+if __name__ == "__main__":
+    n_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"refs ({n_keys} keys)")
+    bench_refs(n_keys)
+    print(f"systems ({n_keys} keys)")
+    bench_system(n_keys)
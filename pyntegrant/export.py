@@ -0,0 +1,132 @@
+"""Exporting dependency graphs (see `map.dependency_graph`) for
+visualization and capacity planning
+"""
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass
+from heapq import nlargest
+from typing import Any, Callable, Mapping, MutableMapping, Optional, TextIO
+
+import networkx as nx
+from networkx import DiGraph
+
+from pyntegrant.map import Key
+
+
+def timed(
+    f: Callable[[Key, Any], Any], timings: MutableMapping[Key, float]
+) -> Callable[[Key, Any], Any]:
+    """Wraps a build function (see `map.build`) so that the time taken to
+    build each key, in seconds, is recorded in `timings`."""
+
+    def timed_f(k: Key, v: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return f(k, v)
+        finally:
+            timings[k] = time.perf_counter() - start
+
+    return timed_f
+
+
+def levels(g: DiGraph) -> dict[Any, int]:
+    """Assigns each node a level: 0 for nodes with no dependencies, and
+    otherwise one more than the highest level among its dependencies.
+    All nodes on one level can be built in parallel once the levels
+    below are built.
+    """
+    result: dict[Any, int] = {}
+    for node in reversed(list(nx.topological_sort(g))):
+        result[node] = 1 + max((result[d] for d in g.successors(node)), default=-1)
+    return result
+
+
+@dataclass(frozen=True)
+class GraphMetrics:
+    """The shape of a dependency graph.
+
+    `depth` is the number of levels (the longest chain of dependencies),
+    `widths` the number of nodes on each level, `max_parallelism` the
+    largest of those, and `hotspots` the nodes with the most direct
+    dependents, with their counts.
+    """
+
+    depth: int
+    widths: tuple[int, ...]
+    max_parallelism: int
+    hotspots: tuple[tuple[Any, int], ...]
+
+
+def graph_metrics(g: DiGraph, n_hotspots: int = 10) -> GraphMetrics:
+    """Measures g (see `GraphMetrics`)"""
+    node_levels = levels(g)
+    counts = Counter(node_levels.values())
+    widths = tuple(counts[level] for level in range(len(counts)))
+    return GraphMetrics(
+        depth=len(widths),
+        widths=widths,
+        max_parallelism=max(widths, default=0),
+        hotspots=tuple(nlargest(n_hotspots, g.in_degree(), key=lambda nd: nd[1])),
+    )
+
+
+def _dot_id(x: Any) -> str:
+    """Quotes x as a DOT string: backslashes and quotes are escaped and
+    line breaks become DOT's `\\n`; other characters are written as is."""
+    escaped = str(x).replace("\\", "\\\\").replace('"', '\\"')
+    return '"' + escaped.replace("\n", "\\n") + '"'
+
+
+def write_dot(
+    g: DiGraph,
+    out: TextIO,
+    timings: Optional[Mapping[Any, float]] = None,
+    node_levels: Optional[Mapping[Any, int]] = None,
+):
+    """Writes g to `out` in Graphviz DOT format, one line per node and
+    edge.  Nodes are labelled with their build time and level, if given,
+    and nodes on the same level are ranked together.
+    """
+    out.write("digraph pyntegrant {\n")
+    for node in g.nodes:
+        label = str(node)
+        if timings is not None and node in timings:
+            label += f"\n{timings[node] * 1000:.1f}ms"
+        if node_levels is not None:
+            label += f"\nlevel {node_levels[node]}"
+        out.write(f"  {_dot_id(node)} [label={_dot_id(label)}];\n")
+    for a, b in g.edges:
+        out.write(f"  {_dot_id(a)} -> {_dot_id(b)};\n")
+    if node_levels is not None:
+        by_level: dict[int, list] = {}
+        for node, level in node_levels.items():
+            by_level.setdefault(level, []).append(node)
+        for nodes in by_level.values():
+            out.write(f"  {{rank=same; {'; '.join(map(_dot_id, nodes))}}}\n")
+    out.write("}\n")
+
+
+def write_json(
+    g: DiGraph,
+    out: TextIO,
+    timings: Optional[Mapping[Any, float]] = None,
+    node_levels: Optional[Mapping[Any, int]] = None,
+):
+    """Writes g to `out` as JSON of the form
+    `{"nodes": [{"id": ..., "seconds": ..., "level": ...}], "edges": [[a, b]]}`,
+    one node or edge per line.  `seconds` and `level` are only present if
+    timings and levels are given.
+    """
+    out.write('{"nodes": [')
+    for i, node in enumerate(g.nodes):
+        entry: dict[str, Any] = {"id": node}
+        if timings is not None and node in timings:
+            entry["seconds"] = timings[node]
+        if node_levels is not None:
+            entry["level"] = node_levels[node]
+        out.write(("\n" if i == 0 else ",\n") + json.dumps(entry))
+    out.write('\n], "edges": [')
+    for i, edge in enumerate(g.edges):
+        out.write(("\n" if i == 0 else ",\n") + json.dumps(edge))
+    out.write("\n]}\n")
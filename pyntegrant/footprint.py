@@ -0,0 +1,103 @@
+"""Functions for measuring the memory held by the components of a system
+"""
+import gc
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from types import BuiltinFunctionType, FunctionType, ModuleType
+from typing import Any, Callable, Iterable, MutableMapping, Optional
+
+from pyrsistent import pmap
+
+from pyntegrant.map import Key, SystemMap, dependent_keys
+
+# objects of these types are shared by the whole program rather than
+# owned by a component, so the size walk does not count or follow them
+_SHARED_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType)
+
+
+def deep_sizeof(x: Any, seen: set[int]) -> int:
+    """The size in bytes of x and everything reachable from it, not
+    counting objects whose ids are already in `seen` (which is updated
+    with the objects counted here).
+    """
+    size = 0
+    objs = [x]
+    while objs:
+        obj = objs.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        objs.extend(gc.get_referents(obj))
+    return size
+
+
+def traced(
+    f: Callable[[Key, Any], Any], allocations: MutableMapping[Key, int]
+) -> Callable[[Key, Any], Any]:
+    """Wraps a build function (see `map.build`) so that the memory
+    still allocated when each call returns, as seen by tracemalloc, is
+    recorded in `allocations` under the key being built.
+    """
+
+    def traced_f(k: Key, v: Any) -> Any:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            return f(k, v)
+        finally:
+            after, _ = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+            allocations[k] = after - before
+
+    return traced_f
+
+
+@dataclass(frozen=True)
+class Footprint:
+    """Memory held by a system, in bytes.
+
+    `components` maps each key to the memory reachable from its
+    component; objects reachable from several components are attributed
+    to the first one built.  `original_config` is the memory kept alive
+    only by the system's copy of its config.  `allocations` is the memory
+    allocated by each handler, if the build was traced.
+    """
+
+    components: SystemMap
+    original_config: int
+    allocations: SystemMap
+
+    @property
+    def total(self) -> int:
+        return sum(self.components.values()) + self.original_config
+
+
+def footprint(
+    components: SystemMap,
+    original_config: Optional[SystemMap],
+    allocations: Optional[SystemMap] = None,
+) -> Footprint:
+    """Measures the footprint of a built system (see `Footprint`).
+
+    Components are measured in build order so that a component holding
+    references to its dependencies is not charged for them.
+    """
+    order: Iterable[Key] = (
+        components.keys()
+        if original_config is None
+        else dependent_keys(original_config, components.keys())
+    )
+    seen: set[int] = set()
+    sizes = {k: deep_sizeof(components[k], seen) for k in order}
+    return Footprint(
+        components=pmap(sizes),
+        original_config=0
+        if original_config is None
+        else deep_sizeof(original_config, seen),
+        allocations=pmap(allocations or {}),
+    )
@@ -1,9 +1,13 @@
 """Initializer for single-dispatch
 """
-from typing import Callable, Mapping
+from functools import partial
+from typing import Any, Callable, Mapping, Optional
 
 from icontract import require
 
+from pyntegrant.map import template_matcher
+from pyntegrant.policy import NO_RETRY, Deadline, RetryPolicy, call_with_policy
+
 
 class Initializer(object):
     """The Initializer class represents a single-dispatch function where
@@ -15,6 +19,10 @@ class Initializer(object):
     def __init__(self):
         self.handlers = {}
         self.default_handler = None
+        self.halt_handlers = {}
+        self.timeouts = {}
+        self.retries = {}
+        self.templates = {}
 
     def register_default(self):
         """Registers a default handler.  Fails if attempted twice.
@@ -30,34 +38,111 @@ class Initializer(object):
 
         return register_function
 
-    def register(self, key: str):
+    def register(
+        self,
+        key: str,
+        timeout: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None,
+        template: bool = False,
+    ):
         """Decorator to register handlers for the initializer.
 
         One would create an initializer (`result=Initializer`) and
         then register a number of handlers, where each registration
         corresponds to a key in the config (`@result.register("server")`)
+
+        A handler may be given a timeout in seconds for each call and a
+        retry policy, eg `@result.register("db", 5, RetryPolicy(3, 0.5))`.
+
+        If `template` is set, key is a key template pattern (see
+        `loaders.load`), eg "worker-{n}", and the handler, timeout and retry
+        policy apply to every instance key, eg "worker-3", which has no
+        handler of its own.
         """
+        if template:
+            self._register_template(key)
 
         def register_function(f):
             self.handlers[key] = f
+            if timeout is not None:
+                self.timeouts[key] = timeout
+            if retry is not None:
+                self.retries[key] = retry
+            return f
+
+        return register_function
+
+    def register_halt(self, key: str, template: bool = False):
+        """Decorator to register a handler which stops the component
+        built for `key`; it is called with the component as its argument.
+        As with `register`, `template` makes key a key template pattern.
+        """
+        if template:
+            self._register_template(key)
+
+        def register_function(f):
+            self.halt_handlers[key] = f
             return f
 
         return register_function
 
-    def initialize(self, key, value):
+    def _register_template(self, key: str):
+        matcher = template_matcher(key)
+        if matcher is None:
+            raise ValueError(f"{key} is not a key template with one placeholder")
+        self.templates[key] = matcher
+
+    def registered_key(self, registry: Mapping[str, Any], key) -> Optional[str]:
+        """The key under which key has an entry in `registry` (eg
+        `handlers`): key itself, or failing that a template pattern which key
+        is an instance of, or None"""
+        if key in registry:
+            return key
+        for pattern, matcher in self.templates.items():
+            if pattern in registry and matcher.fullmatch(key):
+                return pattern
+        return None
+
+    def initialize(self, key, value, deadline: Optional[Deadline] = None):
         """Dispatches initialization based on `key`.
 
         If the value is a mapping, calls the handler with `**value`
         so that handlers can have keyword arguments and values can be
         dicts.  If the value is a single non-mapping value, it is passed
         to the handler as a single argument.
+
+        The handler's timeout and retry policy, if any, are applied, and
+        it is not allowed to run past `deadline`.  With a timeout or a
+        deadline the handler is called in a worker thread (see
+        `policy.call_with_policy`).
         """
-        if key in self.handlers:
+        # the handler, timeout and retry policy all come from one registration
+        registered = self.registered_key(self.handlers, key)
+        if registered is not None:
             if isinstance(value, Mapping):
-                return self.handlers[key](**value)
+                call = partial(self.handlers[registered], **value)
             else:
-                return self.handlers[key](value)
+                call = partial(self.handlers[registered], value)
         elif self.default_handler is not None:
-            return self.default_handler(value)
+            call = partial(self.default_handler, value)
         else:
             raise ValueError(f"No handler found for key {key}")
+        timeout = self.timeouts.get(registered)
+        retry = self.retries.get(registered)
+        if deadline is None and timeout is None and retry is None:
+            return call()
+        return call_with_policy(
+            call,
+            key,
+            timeout,
+            NO_RETRY if retry is None else retry,
+            deadline,
+            on_abandoned=partial(self.halt, key),
+        )
+
+    def halt(self, key, value: Any):
+        """Stops the component `value` built for `key` with its halt
+        handler, if one is registered"""
+        registered = self.registered_key(self.halt_handlers, key)
+        if registered is not None:
+            self.halt_handlers[registered](value)
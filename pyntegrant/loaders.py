@@ -4,14 +4,36 @@ refs, and processing that dict to use PRef refs for processing as a
 SystemMap
 """
 import json
-from typing import Any, Callable
+import mmap
+import os
+import pickle
+import struct
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import chain
+from typing import Any, Callable, Iterable, Iterator, Optional
 
+import networkx as nx
 import toml
 from icontract import require
+from networkx import DiGraph
 from pyrsistent import pmap
 
 from pyntegrant.helpers import postwalk
-from pyntegrant.map import PRef, SystemMap
+from pyntegrant.map import (
+    TEMPLATE_PARAM,
+    Key,
+    PRef,
+    RefPath,
+    RefPaths,
+    SystemMap,
+    assoc_in,
+    dependency_graph,
+    get_in,
+    graph_from_refs,
+    is_reflike,
+)
 
 
 def default_ref_selector(x: Any) -> bool:
@@ -40,6 +62,290 @@ def replace_refs(
     return pmap(postwalk(lambda x: transform(x) if selector(x) else x, config))
 
 
+class TagHandlers(object):
+    """A registry of handlers for tagged strings in a config, such as
+    "#p/env HOME".  Each handler is registered under its tag name and is
+    called with the remainder of the string (after the first space).
+    """
+
+    prefix = "#p/"
+
+    def __init__(self):
+        self.handlers = {}
+
+    def register(self, tag: str):
+        """Decorator to register a handler for a tag, eg
+        `@result.register("env")` handles "#p/env NAME" strings.
+        """
+
+        def register_function(f):
+            self.handlers[tag] = f
+            return f
+
+        return register_function
+
+    def is_tagged(self, x: Any) -> bool:
+        return isinstance(x, str) and x.startswith(self.prefix)
+
+    def handle(self, x: str) -> Any:
+        """Dispatches the tagged string to its handler"""
+        tag, _, arg = x[len(self.prefix) :].partition(" ")
+        if tag in self.handlers:
+            return self.handlers[tag](arg)
+        else:
+            raise ValueError(f"No handler found for tag {tag}")
+
+
+def default_tag_handlers() -> TagHandlers:
+    """Tag handlers for "#p/env NAME [default]", which is replaced by the
+    environment variable NAME, and "#p/include path", which is replaced by
+    the contents of a JSON or TOML file (itself processed for tags).
+    """
+    result = TagHandlers()
+
+    @result.register("env")
+    def _(arg):
+        name, _, default = arg.partition(" ")
+        if name in os.environ:
+            return os.environ[name]
+        elif default:
+            return default
+        else:
+            raise ValueError(f"Environment variable {name} is not set")
+
+    @result.register("include")
+    def _(path):
+        if path.endswith(".toml"):
+            return toml.load(path)
+        with open(path, "r") as f:
+            return json.load(f)
+
+    return result
+
+
+@dataclass(frozen=True)
+class LoadedConfig:
+    """A PRef-style map together with the position of every ref in it,
+    as produced by `load`.
+    """
+
+    config: SystemMap
+    ref_paths: RefPaths
+
+    @cached_property
+    def graph(self) -> DiGraph:
+        """The dependency graph, built from the recorded refs"""
+        return graph_from_refs(
+            {k: [ref.key for _, ref in paths] for k, paths in self.ref_paths.items()}
+        )
+
+
+@dataclass(frozen=True)
+class KeyTemplate:
+    """A config entry which stands for one key per parameter value, eg
+    "worker-{n}" for "worker-0" ... "worker-511".
+
+    The body is loaded once, and the positions of its refs and of the
+    strings containing the parameter placeholder are recorded then, so an
+    instance only copies the containers along those positions and shares
+    the rest of the body with every other instance.
+    """
+
+    pattern: str
+    param: str
+    values: tuple[Any, ...]
+    body: Any
+    ref_paths: tuple[tuple[RefPath, PRef], ...]
+    param_paths: tuple[RefPath, ...]
+
+    @property
+    def placeholder(self) -> str:
+        return "{" + self.param + "}"
+
+    def key(self, value: Any) -> Key:
+        return self.pattern.replace(self.placeholder, str(value))
+
+    def substitute(self, x: str, value: Any) -> Any:
+        """Replaces the placeholder in x; a string which is only the
+        placeholder is replaced by the value itself"""
+        return (
+            value if x == self.placeholder else x.replace(self.placeholder, str(value))
+        )
+
+    def instance_ref_paths(self, value: Any) -> tuple[tuple[RefPath, PRef], ...]:
+        return tuple(
+            (path, type(ref)(self.substitute(ref.key, value)))
+            for path, ref in self.ref_paths
+        )
+
+    def instance(self, value: Any) -> Any:
+        """The body of the entry for value"""
+        result = self.body
+        for path in self.param_paths:
+            result = assoc_in(
+                result, path, self.substitute(get_in(result, path), value)
+            )
+        for path, ref in self.instance_ref_paths(value):
+            if self.placeholder in get_in(self.body, path).key:
+                result = assoc_in(result, path, ref)
+        return result
+
+
+TEMPLATE_RANGE = "#p/range"
+TEMPLATE_EACH = "#p/each"
+
+
+def is_template(k: Key, v: Any) -> bool:
+    """Whether the config entry k, v is a key template: a key with a
+    "{param}" placeholder and a dict value with either a "#p/range" entry
+    ([stop], [start, stop] or [start, stop, step]) or a "#p/each" entry
+    (a list of values) giving the parameter values.
+    """
+    return (
+        isinstance(v, dict)
+        and (TEMPLATE_RANGE in v or TEMPLATE_EACH in v)
+        and TEMPLATE_PARAM.search(k) is not None
+    )
+
+
+class TemplatedConfig(Mapping):
+    """A read-only map of plain entries plus the instances of key
+    templates, where each instance is only created when it is looked up.
+    `expand` gives the value for an instance from its template and
+    parameter value.
+    """
+
+    def __init__(
+        self,
+        plain: SystemMap,
+        templates: Iterable[KeyTemplate],
+        expand: Callable[[KeyTemplate, Any], Any],
+    ):
+        self.plain = plain
+        self.expand = expand
+        self.instances: dict[Key, tuple[KeyTemplate, Any]] = {}
+        duplicates = []
+        for t in templates:
+            for v in t.values:
+                k = t.key(v)
+                if k in plain or k in self.instances:
+                    duplicates.append(k)
+                self.instances[k] = (t, v)
+        if duplicates:
+            raise ValueError(f"Template instances duplicate keys {duplicates}")
+
+    def __getitem__(self, k: Key) -> Any:
+        if k in self.plain:
+            return self.plain[k]
+        template, value = self.instances[k]
+        return self.expand(template, value)
+
+    def __contains__(self, k: object) -> bool:
+        return k in self.plain or k in self.instances
+
+    def __iter__(self) -> Iterator[Key]:
+        return chain(self.plain, self.instances)
+
+    def __len__(self) -> int:
+        return len(self.plain) + len(self.instances)
+
+
+def load(
+    config: SystemMap,
+    selector: Callable[[Any], bool] = default_ref_selector,
+    transform: Callable[[Any], Any] = default_ref_transform,
+    tags: Optional[TagHandlers] = None,
+) -> LoadedConfig:
+    """Create a PRef-style map from a dict with string refs and tags in a
+    single traversal, recording where each ref was found.
+
+    Strings matching `selector` are transformed into refs as with
+    `replace_refs`; other tagged strings are passed to their handler in
+    `tags` (by default `default_tag_handlers()`).  If a handler returns
+    a list or dict it is processed in the same traversal.
+
+    Entries which are key templates (see `is_template`) are loaded once
+    and instantiated lazily, with the placeholder replaced in strings and
+    refs in the body, eg
+    `{"worker-{n}": {"#p/range": [4], "id": "{n}", "next": "#p/ref worker-{n}"}}`.
+    Tags in a template body are resolved once, not per instance.  A
+    template key has exactly one placeholder, and its instances may not
+    duplicate any other key.  Handlers registered under the template key
+    with `template=True` apply to every instance (see
+    `Initializer.register`).
+    """
+    tags = default_tag_handlers() if tags is None else tags
+
+    def load_value(
+        x: Any,
+        path: RefPath,
+        found: list,
+        placeholder: str = "",
+        params: Optional[list] = None,
+    ) -> Any:
+        if selector(x):
+            x = transform(x)
+        elif tags.is_tagged(x):
+            x = tags.handle(x)
+        if is_reflike(x):
+            found.append((path, x))
+            return x
+        elif isinstance(x, dict):
+            return {
+                k: load_value(v, path + (k,), found, placeholder, params)
+                for k, v in x.items()
+            }
+        elif isinstance(x, (list, tuple)):
+            return [
+                load_value(v, path + (i,), found, placeholder, params)
+                for i, v in enumerate(x)
+            ]
+        elif params is not None and isinstance(x, str) and placeholder in x:
+            params.append(path)
+            return x
+        else:
+            return x
+
+    def load_template(k: Key, v: dict) -> KeyTemplate:
+        placeholders = TEMPLATE_PARAM.findall(k)
+        if len(placeholders) != 1:
+            raise ValueError(
+                f"Key template {k} must have exactly one placeholder,"
+                f" not {len(placeholders)}"
+            )
+        param = placeholders[0]
+        body = {
+            b: bv for b, bv in v.items() if b not in (TEMPLATE_RANGE, TEMPLATE_EACH)
+        }
+        values = (
+            tuple(range(*v[TEMPLATE_RANGE]))
+            if TEMPLATE_RANGE in v
+            else tuple(v[TEMPLATE_EACH])
+        )
+        found: list = []
+        params: list = []
+        loaded_body = load_value(body, (), found, "{" + param + "}", params)
+        return KeyTemplate(k, param, values, loaded_body, tuple(found), tuple(params))
+
+    loaded = {}
+    ref_paths = {}
+    templates = []
+    for k, v in config.items():
+        if is_template(k, v):
+            templates.append(load_template(k, v))
+            continue
+        found: list = []
+        loaded[k] = load_value(v, (), found)
+        if found:
+            ref_paths[k] = tuple(found)
+    if not templates:
+        return LoadedConfig(pmap(loaded), pmap(ref_paths))
+    return LoadedConfig(
+        TemplatedConfig(pmap(loaded), templates, KeyTemplate.instance),
+        TemplatedConfig(pmap(ref_paths), templates, KeyTemplate.instance_ref_paths),
+    )
+
+
 def from_dict(d: SystemMap) -> SystemMap:
     """Create a PRef-style map from a dict with string refs"""
     return replace_refs(d)
@@ -64,3 +370,87 @@ def from_json(json_path: str) -> SystemMap:
 def from_jsons(json_str: str) -> SystemMap:
     """Create a PRef-style map from json string"""
     return from_dict(json.loads(json_str))
+
+
+SNAPSHOT_MAGIC = b"PYNSNAP\x01"
+_SNAPSHOT_HEADER = struct.Struct("<8sQQQ")
+
+
+def to_snapshot(config: SystemMap, snapshot_path: str) -> None:
+    """Write a PRef-style map to a binary snapshot file, together with
+    its dependency graph and topological order.
+
+    The file is a fixed header (magic and section lengths) followed by
+    three independently pickled sections: the config, the graph and
+    the order, so that each can be loaded without touching the others.
+    """
+    g = dependency_graph(config)
+    sections = [
+        pickle.dumps(pmap(config), protocol=pickle.HIGHEST_PROTOCOL),
+        pickle.dumps(g, protocol=pickle.HIGHEST_PROTOCOL),
+        pickle.dumps(list(nx.topological_sort(g)), protocol=pickle.HIGHEST_PROTOCOL),
+    ]
+    with open(snapshot_path, "wb") as f:
+        f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, *(len(s) for s in sections)))
+        for section in sections:
+            f.write(section)
+
+
+class Snapshot(object):
+    """A memory-mapped snapshot written by `to_snapshot`.
+
+    Sections are only unpickled on first access, so opening a snapshot
+    is cheap and a build never parses text or walks the config for refs.
+    Snapshots are pickles; only open files from trusted sources.
+
+    The file stays mapped until `close` is called (or the snapshot is used
+    as a context manager and the block exits); sections already loaded
+    remain available after closing.
+    """
+
+    def __init__(self, snapshot_path: str):
+        with open(snapshot_path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *lengths = _SNAPSHOT_HEADER.unpack_from(self._buffer)
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f"{snapshot_path} is not a pyntegrant snapshot")
+        offset = _SNAPSHOT_HEADER.size
+        self._sections = []
+        for length in lengths:
+            self._sections.append((offset, offset + length))
+            offset += length
+
+    def close(self):
+        """Unmaps the snapshot file"""
+        self._buffer.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _load(self, section: int) -> Any:
+        start, end = self._sections[section]
+        return pickle.loads(self._buffer[start:end])
+
+    @cached_property
+    def config(self) -> SystemMap:
+        """The ref-resolved config"""
+        return self._load(0)
+
+    @cached_property
+    def graph(self) -> DiGraph:
+        """The dependency graph of the config"""
+        return self._load(1)
+
+    @cached_property
+    def order(self) -> list[Key]:
+        """The topological order of the dependency graph"""
+        return self._load(2)
+
+
+def from_snapshot(snapshot_path: str) -> Snapshot:
+    """Open a snapshot file written by `to_snapshot`"""
+    return Snapshot(snapshot_path)
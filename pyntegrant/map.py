@@ -3,9 +3,21 @@ defining a mapping for pyntegrant which represents
 a system
 """
 
+import re
 from dataclasses import dataclass
 from functools import partial, reduce
-from typing import Any, Callable, Iterable, KeysView, Mapping, NewType, Union
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    KeysView,
+    Mapping,
+    NewType,
+    Optional,
+    Sequence,
+    Union,
+)
+from weakref import WeakValueDictionary
 
 import networkx as nx
 from icontract import ensure, require
@@ -17,15 +29,53 @@ from pyntegrant.helpers import depth_search, postwalk, reduce_kv
 Key = str
 
 
-@dataclass(eq=True, frozen=True)
+_interned_refs: WeakValueDictionary = WeakValueDictionary()
+
+
+# no generated __init__: the key is set once, in __new__, when the ref is interned
+@dataclass(eq=True, frozen=True, init=False)
 class PRef:
-    """A marker class, used in dict-based config values to refer to a key."""
+    """A marker class, used in dict-based config values to refer to a key.
+
+    Instances are interned, so all refs to the same key are one object.
+    """
+
+    __slots__ = ("key", "__weakref__")
 
     key: str
 
+    def __new__(cls, key: str):
+        ref = _interned_refs.get((cls, key))
+        if ref is None:
+            ref = super().__new__(cls)
+            object.__setattr__(ref, "key", key)
+            ref = _interned_refs.setdefault((cls, key), ref)
+        return ref
+
+    def __reduce__(self):
+        return (type(self), (self.key,))
+
 
 SystemMap = Mapping[Key, Any]
 Keyset = Union[frozenset[Key], KeysView]
+# the position of a ref within a key's value, as a sequence of dict keys
+# and list indices, and for each key the refs found at those positions
+RefPath = tuple[Any, ...]
+RefPaths = Mapping[Key, tuple[tuple[RefPath, PRef], ...]]
+# the "{param}" placeholder in a key template, eg "worker-{n}"
+TEMPLATE_PARAM = re.compile(r"\{(\w+)\}")
+
+
+def template_matcher(pattern: Key) -> Optional[re.Pattern]:
+    """A regex which fully matches the instance keys of the key template
+    pattern, eg "worker-{n}", or None if pattern has no single placeholder"""
+    if not isinstance(pattern, str):
+        return None
+    parts = TEMPLATE_PARAM.split(pattern)
+    if len(parts) != 3:
+        return None
+    before, _, after = parts
+    return re.compile(re.escape(before) + "(.+)" + re.escape(after))
 
 
 def all_keys_valid(m: SystemMap) -> bool:
@@ -34,12 +84,11 @@ def all_keys_valid(m: SystemMap) -> bool:
 
 
 def all_refs_resolveable(m: SystemMap) -> bool:
-    """Whether all refs (PRef classes) in the map resolve to
-    keys.
+    """Whether all refs (PRef classes) anywhere in the map's values
+    resolve to keys.
     """
-    refs = frozenset((v for v in m.values() if isinstance(v, PRef)))
-    keys = frozenset(m.keys())
-    return all((ref.key in keys for ref in refs))
+    refs = frozenset.union(frozenset(), *(find_refs(v) for v in m.values()))
+    return all((ref in m for ref in refs))
 
 
 def is_reflike(x: Any) -> bool:
@@ -60,6 +109,17 @@ def add_dependency(g: DiGraph, a: Any, b: Any) -> DiGraph:
     return g
 
 
+def graph_from_refs(refs: Mapping[Key, Iterable[Key]]) -> DiGraph:
+    """Creates a dependency graph from a map of each key to the keys it
+    refers to (see `dependency_graph`).
+    """
+    return reduce_kv(  # type:ignore
+        lambda g, k, v: reduce(lambda g2, v2: add_dependency(g2, k, v2), v, g),
+        DiGraph(),
+        refs,
+    )
+
+
 def dependency_graph(config: SystemMap) -> DiGraph:
     """Given a config, creates a directed graph representing dependencies.
 
@@ -68,13 +128,7 @@ def dependency_graph(config: SystemMap) -> DiGraph:
     sorted to determine an initialization order.  An edge ('A', 'B') in the digraph
     represents the dependency of A on B.
     """
-    return reduce_kv(  # type:ignore
-        lambda g, k, v: reduce(
-            lambda g2, v2: add_dependency(g2, k, v2), find_refs(v), g
-        ),
-        DiGraph(),
-        config,
-    )
+    return graph_from_refs({k: find_refs(v) for k, v in config.items()})
 
 
 # There was a requirement that all nodes in the config be in the
@@ -97,25 +151,49 @@ def transitive_dependencies_set(g: DiGraph, nodes: Keyset) -> Keyset:
     directly or transitively
     """
     dependent_nodes = frozenset({n for n in nodes if n in g})
-    return frozenset.union(
+    return frozenset().union(
         *[transitive_dependencies(g, node) for node in dependent_nodes]
     )
 
 
+@ensure(lambda result, g: all([n in g for n in result]))
+def transitive_dependents_set(g: DiGraph, nodes: Keyset) -> Keyset:
+    """The set of all things which depend on any node in nodes,
+    directly or transitively
+    """
+    return frozenset().union(*[nx.ancestors(g, node) for node in nodes if node in g])
+
+
 def find_keys(
-    config: SystemMap, keys: Keyset, f: Callable[[DiGraph, Keyset], Keyset]
+    config: SystemMap,
+    keys: Keyset,
+    f: Callable[[DiGraph, Keyset], Keyset],
+    g: Optional[DiGraph] = None,
+    order: Optional[Sequence[Key]] = None,
 ) -> list[Key]:
     """Return the union of keys and f(config, keys), topologically sorted
-    so that the last item in the list depends on everything before it"""
-    g = dependency_graph(config)
+    so that the last item in the list depends on everything before it.
+
+    A precomputed dependency graph `g` and topological `order` (as
+    stored in a snapshot) may be passed to skip rebuilding them from
+    the config.
+    """
+    g = dependency_graph(config) if g is None else g
     fkeys = frozenset(f(g, keys))
     result = frozenset.union(frozenset(keys), fkeys)
-    sorted_nodes = list(nx.topological_sort(g))
-    return sorted(result, key=lambda x: sorted_nodes.index(x), reverse=True)
+    sorted_nodes = list(nx.topological_sort(g)) if order is None else order
+    positions = {node: i for i, node in enumerate(sorted_nodes)}
+    # keys outside the graph have no dependencies, so they can go first
+    return sorted(result, key=lambda x: positions.get(x, len(positions)), reverse=True)
 
 
-def dependent_keys(config: SystemMap, keys: Keyset) -> list[Key]:
-    return find_keys(config, keys, transitive_dependencies_set)
+def dependent_keys(
+    config: SystemMap,
+    keys: Keyset,
+    g: Optional[DiGraph] = None,
+    order: Optional[Sequence[Key]] = None,
+) -> list[Key]:
+    return find_keys(config, keys, transitive_dependencies_set, g, order)
 
 
 def select_keys(config: SystemMap, keys: Iterable[Key]) -> SystemMap:
@@ -142,6 +220,41 @@ def expand_key(config: SystemMap, resolvef: Callable[[Key, Any], Any], v: Any) -
     )
 
 
+def get_in(coll: Any, path: RefPath) -> Any:
+    """Returns the element of coll at path"""
+    return reduce(lambda c, k: c[k], path, coll)
+
+
+def assoc_in(coll: Any, path: RefPath, v: Any) -> Any:
+    """Returns a copy of coll with the element at path replaced by v.
+    Only the containers along path are copied."""
+    if len(path) == 0:
+        return v
+    head, *tail = path
+    if isinstance(coll, tuple):
+        return coll[:head] + (assoc_in(coll[head], tail, v),) + coll[head + 1 :]
+    result = dict(coll) if isinstance(coll, Mapping) else list(coll)
+    result[head] = assoc_in(coll[head], tail, v)
+    return result
+
+
+def expand_paths(
+    config: SystemMap,
+    resolvef: Callable[[Key, Any], Any],
+    v: Any,
+    paths: Iterable[tuple[RefPath, PRef]],
+) -> Any:
+    """Like `expand_key`, but only visits the recorded ref positions
+    in v rather than walking all of it"""
+    return reduce(
+        lambda acc, path_ref: assoc_in(
+            acc, path_ref[0], ref_resolve(path_ref[1], config, resolvef)
+        ),
+        paths,
+        v,
+    )
+
+
 @ensure(lambda result, k, v: result[k] == v)
 def assoc(system: SystemMap, k: Key, v: Any):
     return pmap(system).update(pmap({k: v}))
@@ -152,29 +265,50 @@ def build_key(
     resolvef: Callable[[Key, Any], Any],
     system: SystemMap,
     kv: tuple[Key, Any],
+    ref_paths: Optional[RefPaths] = None,
 ) -> SystemMap:
     k, v = kv
-    expanded_value = expand_key(system, resolvef, v)
+    expanded_value = (
+        expand_key(system, resolvef, v)
+        if ref_paths is None
+        else expand_paths(system, resolvef, v, ref_paths.get(k, ()))
+    )
     built_value = buildfn(k, expanded_value)
     return assoc(system, k, built_value)
 
 
-def build(config: SystemMap, keys: Keyset, f: Callable[[Key, Any], Any]) -> SystemMap:
+def build(
+    config: SystemMap,
+    keys: Keyset,
+    f: Callable[[Key, Any], Any],
+    g: Optional[DiGraph] = None,
+    order: Optional[Sequence[Key]] = None,
+    ref_paths: Optional[RefPaths] = None,
+    system: Optional[SystemMap] = None,
+) -> SystemMap:
     """Apply function f to each (key, value) pair in a configuration map,
     traversing keys in dependency order and expanding any references in the value.
 
     The function should take two arguments, a key and value, and return a new value.
 
+    `g` and `order` are an optional precomputed dependency graph and
+    topological order for the config (see `dependent_keys`).  If the
+    positions of all refs are known (see `loaders.load`), passing them
+    as `ref_paths` avoids walking each value to expand its refs.
+
+    If `system` (a previously built system) is given, keys already in it
+    are reused rather than rebuilt, and are included in the result.
+
     Todo: An optional fourth argument, assertf, may be supplied to provide an
     assertion check on the system, key, and expanded value.
     """
-    relevant_keys = dependent_keys(config, keys)
-    relevant_config = select_keys(config, relevant_keys)
+    system = pmap() if system is None else system
+    relevant_keys = dependent_keys(config, keys, g, order)
     resolvef = lambda k, v: v
     return pmap(
         reduce(
-            partial(build_key, f, resolvef),  # type:ignore
-            ((k, config[k]) for k in relevant_keys),
-            {},
+            partial(build_key, f, resolvef, ref_paths=ref_paths),  # type:ignore
+            ((k, config[k]) for k in relevant_keys if k not in system),
+            system,
         ),
     )
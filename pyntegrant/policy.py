@@ -0,0 +1,123 @@
+"""Timeouts, deadlines and retry policies for initializing components
+"""
+import concurrent.futures
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+
+class BuildTimeout(TimeoutError):
+    """Raised when a component is not initialized within its timeout, or
+    the build's deadline passes"""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How to retry a failing handler: up to `attempts` calls in all,
+    waiting `backoff` seconds after the first failure and multiplying the
+    wait by `multiplier` after each further failure, up to `max_backoff`.
+    Only exceptions of the types in `retry_on` (which include timeouts by
+    default) are retried.
+    """
+
+    attempts: int = 1
+    backoff: float = 0.0
+    multiplier: float = 2.0
+    max_backoff: Optional[float] = None
+    retry_on: tuple[type[BaseException], ...] = (Exception,)
+
+    def __post_init__(self):
+        if self.attempts < 1:
+            raise ValueError(
+                f"A retry policy needs at least 1 attempt, not {self.attempts}"
+            )
+        if self.backoff < 0:
+            raise ValueError(f"Retry backoff can't be negative, not {self.backoff}")
+
+
+NO_RETRY = RetryPolicy()
+
+
+class Deadline(object):
+    """A point in time by which a whole build must be finished, measured
+    with `clock` (by default `time.monotonic`)"""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.seconds = seconds
+        self.clock = clock
+        self.expires = clock() + seconds
+
+    def remaining(self) -> float:
+        return self.expires - self.clock()
+
+
+def call_with_timeout(
+    f: Callable[[], Any],
+    timeout: Optional[float],
+    on_abandoned: Callable[[Any], Any],
+    name: str,
+) -> Any:
+    """Calls f, raising BuildTimeout if it hasn't returned within timeout
+    seconds (if timeout is not None).
+
+    A running call can't be cancelled, so on timeout it is left to finish
+    in a daemon thread; if it eventually succeeds, its result is passed to
+    `on_abandoned` (eg to halt it).
+    """
+    if timeout is None:
+        return f()
+    future: Future = Future()
+
+    def run():
+        try:
+            future.set_result(f())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True, name=f"pyntegrant-{name}").start()
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.add_done_callback(
+            lambda fut: on_abandoned(fut.result()) if fut.exception() is None else None
+        )
+        raise BuildTimeout(f"{name} was not initialized within {timeout}s") from None
+
+
+def call_with_policy(
+    f: Callable[[], Any],
+    name: str,
+    timeout: Optional[float] = None,
+    retry: RetryPolicy = NO_RETRY,
+    deadline: Optional[Deadline] = None,
+    on_abandoned: Callable[[Any], Any] = lambda _: None,
+) -> Any:
+    """Calls f with the given per-call timeout and retry policy, never
+    starting an attempt or waiting past the deadline.
+
+    f runs in the calling thread only if there is neither a timeout nor a
+    deadline; otherwise each attempt runs in its own thread (see
+    `call_with_timeout`) so that a call which never returns can't outlast
+    them.  Handlers which create thread-affine resources should therefore
+    not be given a timeout or be built with a deadline.
+    """
+    delay = retry.backoff
+    for attempt in range(1, retry.attempts + 1):
+        remaining = None if deadline is None else deadline.remaining()
+        if remaining is not None and remaining <= 0:
+            raise BuildTimeout(f"Deadline passed before {name} was initialized")
+        attempt_timeout = timeout
+        if remaining is not None:
+            attempt_timeout = remaining if timeout is None else min(timeout, remaining)
+        try:
+            return call_with_timeout(f, attempt_timeout, on_abandoned, name)
+        except retry.retry_on:
+            out_of_time = deadline is not None and deadline.remaining() <= delay
+            if attempt == retry.attempts or out_of_time:
+                raise
+        time.sleep(delay)
+        delay = delay * retry.multiplier
+        if retry.max_backoff is not None:
+            delay = min(delay, retry.max_backoff)
@@ -1,18 +1,194 @@
 """Functions that have more to do with building and manipulating systems
 """
-from typing import Any, Callable, Optional
+import threading
+import warnings
+import weakref
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+)
 
+from icontract import require
+from networkx import DiGraph
+from pyrsistent import pmap
+
+from pyntegrant.export import timed
+from pyntegrant.footprint import Footprint, footprint, traced
+from pyntegrant.helpers import identity
 from pyntegrant.initializer import Initializer
-from pyntegrant.loaders import default_ref_selector, default_ref_transform, replace_refs
-from pyntegrant.map import Key, Keyset, SystemMap, build, dependent_keys
+from pyntegrant.loaders import (
+    LoadedConfig,
+    Snapshot,
+    default_ref_selector,
+    default_ref_transform,
+    replace_refs,
+)
+from pyntegrant.map import (
+    Key,
+    Keyset,
+    RefPaths,
+    SystemMap,
+    build,
+    dependency_graph,
+    dependent_keys,
+    transitive_dependents_set,
+)
+from pyntegrant.policy import Deadline
+from pyntegrant.validation import ConfigError, check
+
+
+# bounded, so that systems whose key sets keep changing (reloads, tenants,
+# templates) don't accumulate classes; an evicted layout is simply
+# recreated the next time it is needed
+@lru_cache(maxsize=256)
+def _layout(cls: type, keys: frozenset[Key]) -> type:
+    """A subclass of cls with a slot for each key which can be used as an
+    attribute name, so that components are stored and read as slots
+    rather than through a per-instance dict.  One class is created per
+    distinct set of keys.
+
+    Keys which clash with any name already defined on cls (methods,
+    properties, slots and class attributes) get no slot, and are read
+    from `components` like keys which aren't identifiers.
+    """
+    reserved = frozenset(
+        {"_layout_base", "_layout_slots"}.union(*(vars(c).keys() for c in cls.__mro__))
+    )
+    slots = tuple(
+        sorted(
+            k
+            for k in keys
+            if k.isidentifier() and not k.startswith("__") and k not in reserved
+        )
+    )
+    return type(
+        cls.__name__,
+        (cls,),
+        {
+            "__slots__": slots,
+            "__module__": cls.__module__,
+            "__qualname__": cls.__qualname__,
+            "_layout_base": cls,
+            "_layout_slots": slots,
+        },
+    )
+
+
+def halt_components(initializer: Initializer, components: Iterable[tuple[Key, Any]]):
+    """Halts each (key, component) pair in turn with the initializer's
+    halt handlers.  A failure to halt one component is reported as a
+    warning and does not stop the others from being halted.
+    """
+    for k, v in components:
+        try:
+            initializer.halt(k, v)
+        except Exception as e:
+            warnings.warn(f"Halting {k} failed: {e!r}")
+
+
+def halt_order(
+    components: SystemMap, config: Optional[SystemMap], keys: Iterable[Key]
+) -> list[tuple[Key, Any]]:
+    """The (key, component) pairs for keys, dependents before their
+    dependencies according to config; without a config, keys are taken in
+    reverse order"""
+    keys = list(keys)
+    if config is None:
+        return [(k, components[k]) for k in reversed(keys)]
+    wanted = frozenset(keys)
+    order = dependent_keys(config, wanted)
+    return [(k, components[k]) for k in reversed(order) if k in wanted]
+
+
+def build_or_halt(
+    config: SystemMap,
+    keys: Keyset,
+    initializer: Initializer,
+    deadline: Optional[Deadline] = None,
+    system: Optional[SystemMap] = None,
+    wrap: Callable[[Callable[[Key, Any], Any]], Callable[[Key, Any], Any]] = identity,
+    g: Optional[DiGraph] = None,
+    order: Optional[Sequence[Key]] = None,
+    ref_paths: Optional[RefPaths] = None,
+) -> SystemMap:
+    """Builds keys from config (see `map.build`) with the initializer.  If
+    the build fails, the components it started are halted in reverse order
+    before the exception propagates.  `wrap` may wrap the build function,
+    eg with `footprint.traced`; `g`, `order` and `ref_paths` are passed on
+    to `map.build`.
+    """
+    started: list[tuple[Key, Any]] = []
+
+    def initialize(k: Key, v: Any) -> Any:
+        component = initializer.initialize(k, v, deadline)
+        started.append((k, component))
+        return component
+
+    try:
+        return build(config, keys, wrap(initialize), g, order, ref_paths, system)
+    except BaseException:
+        halt_components(initializer, reversed(started))
+        raise
 
 
 class System(object):
-    """A system of components, initialized from a config."""
+    """A system of components, initialized from a config.
+
+    Components are attributes of the system, eg `system.server`; keys which
+    are not valid attribute names can be read from `components`.
+    """
+
+    __slots__ = ("_table", "_original_config", "_allocations")
+    _layout_slots: tuple[Key, ...] = ()
+
+    def __new__(cls, built_config: SystemMap, original_config: SystemMap):
+        base = cls.__dict__.get("_layout_base", cls)
+        return object.__new__(_layout(base, frozenset(built_config.keys())))
 
     def __init__(self, built_config: SystemMap, original_config: SystemMap):
-        self.__dict__.update(**built_config)
+        # components which have no slot of their own (see _layout)
+        self._table = pmap(
+            {k: v for k, v in built_config.items() if k not in self._layout_slots}
+        )
         self._original_config = original_config
+        self._allocations = pmap()
+        for k in self._layout_slots:
+            setattr(self, k, built_config[k])
+
+    def __getattr__(self, name: str) -> Any:
+        # only called when normal attribute lookup fails, ie for
+        # components without a slot of their own
+        if name == "_table":
+            raise AttributeError(name)
+        try:
+            return self._table[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __dir__(self):
+        return [*super().__dir__(), *self._table.keys()]
+
+    def __reduce__(self):
+        base = type(self).__dict__.get("_layout_base", type(self))
+        return (base, self._state())
+
+    def _state(self) -> tuple[SystemMap, Optional[SystemMap]]:
+        """The components and the config they were built from"""
+        return self.components, self._original_config
+
+    @property
+    def components(self) -> SystemMap:
+        """All components, by key"""
+        if not self._layout_slots:
+            return self._table
+        return self._table.update({k: getattr(self, k) for k in self._layout_slots})
 
     @classmethod
     def from_config(
@@ -22,6 +198,10 @@ class System(object):
         keys: Optional[Keyset] = None,
         ref_selector: Callable[[Any], bool] = default_ref_selector,
         transform: Callable[[Any], bool] = default_ref_transform,
+        trace_allocations: bool = False,
+        validate: bool = True,
+        timeout: Optional[float] = None,
+        timings: Optional[MutableMapping[Key, float]] = None,
     ):
         """Creates a system given a config and an initializer.
 
@@ -29,10 +209,470 @@ class System(object):
         The config must be in Python dict format (in other words, using `PRef`
         references, not text-based "#p/ref ..." references); you can replace
         "#p/ref ..." references with `PRef` references with `replace_refs`
+
+        If `trace_allocations` is set, the memory allocated by each handler
+        is measured with tracemalloc and reported by `footprint`.  If a
+        `timings` map is given, the seconds taken to build each key are
+        recorded in it (see `export.timed`).
+
+        Unless `validate` is False, the config is checked before any handler
+        is called and a `validation.ConfigError` listing every problem found
+        is raised if it can't be built.
+
+        If `timeout` is given, the whole build must finish within that many
+        seconds or `policy.BuildTimeout` is raised (see also the per-key
+        timeouts and retries in `Initializer.register`); each handler then
+        runs in a worker thread, which a handler that never returns is left
+        blocking, rather than in the calling thread.  If the build fails
+        for any reason, the components built so far are halted in reverse
+        order and keys not yet started are never initialized.
         """
-        original_config = replace_refs(config)
+        original_config = replace_refs(config, ref_selector, transform)
+        if validate:
+            check(original_config, initializer, keys)
         keys = (
             config.keys() if keys is None else frozenset(dependent_keys(config, keys))
         )
-        built_config = build(original_config, keys, initializer.initialize)
-        return cls(built_config, original_config)
+        deadline = None if timeout is None else Deadline(timeout)
+        allocations: dict[Key, int] = {}
+
+        def wrap(f):
+            if timings is not None:
+                f = timed(f, timings)
+            return traced(f, allocations) if trace_allocations else f
+
+        built_config = build_or_halt(
+            original_config, keys, initializer, deadline, wrap=wrap
+        )
+        result = cls(built_config, original_config)
+        result._allocations = pmap(allocations)
+        return result
+
+    @classmethod
+    def from_tenants(
+        cls,
+        base_config: SystemMap,
+        tenants: Mapping[str, SystemMap],
+        initializer: Initializer,
+        shared: Keyset,
+        validate: bool = True,
+        timeout: Optional[float] = None,
+    ) -> Mapping[str, "System"]:
+        """Creates one system per tenant, where each tenant's config is
+        `base_config` updated with that tenant's entries in `tenants`.
+
+        The `shared` keys, and everything they depend on, are built once
+        from the base config and the same components are used in every
+        tenant's system; only the remaining keys are built per tenant.  A
+        tenant may therefore not override a shared key or any of its
+        dependencies.
+
+        Validation works as in `from_config`, and `timeout` bounds the
+        whole build, shared and per-tenant components alike.  If any build
+        fails, every component built so far is halted.
+        """
+        base = replace_refs(base_config)
+        if validate:
+            check(base, initializer, shared)
+        shared_keys = frozenset(dependent_keys(base, shared))
+        tenant_configs = {
+            tenant: base.update(replace_refs(overrides))
+            for tenant, overrides in tenants.items()
+        }
+        for tenant, overrides in tenants.items():
+            if not shared_keys.isdisjoint(overrides.keys()):
+                raise ValueError(
+                    f"Tenant {tenant} overrides shared keys "
+                    f"{sorted(shared_keys.intersection(overrides.keys()))}"
+                )
+            if validate:
+                check(tenant_configs[tenant], initializer, built=shared_keys)
+
+        deadline = None if timeout is None else Deadline(timeout)
+        shared_system = build_or_halt(base, shared_keys, initializer, deadline)
+        built: dict[str, SystemMap] = {}
+        try:
+            for tenant, config in tenant_configs.items():
+                built[tenant] = build_or_halt(
+                    config, config.keys(), initializer, deadline, shared_system
+                )
+        except BaseException:
+            # the failing tenant has been halted; halt the others, then
+            # the shared components they were using
+            for tenant, system in reversed(list(built.items())):
+                own = frozenset(system.keys()).difference(shared_keys)
+                halt_components(
+                    initializer, halt_order(system, tenant_configs[tenant], own)
+                )
+            halt_components(initializer, halt_order(shared_system, base, shared_keys))
+            raise
+        return pmap(
+            {
+                tenant: cls(built[tenant], config)
+                for tenant, config in tenant_configs.items()
+            }
+        )
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        snapshot: Snapshot,
+        initializer: Initializer,
+        keys: Optional[Keyset] = None,
+        validate: bool = True,
+        timeout: Optional[float] = None,
+    ):
+        """Creates a system from a snapshot (see `loaders.from_snapshot`).
+
+        The snapshot's config is already ref-resolved and carries its
+        dependency graph and order, so neither is recomputed here.  The
+        config is validated first, and `timeout` and halting on failure
+        work as in `from_config`.
+        """
+        config, g, order = snapshot.config, snapshot.graph, snapshot.order
+        if validate:
+            check(config, initializer, keys, g)
+        keys = (
+            config.keys()
+            if keys is None
+            else frozenset(dependent_keys(config, keys, g, order))
+        )
+        deadline = None if timeout is None else Deadline(timeout)
+        built_config = build_or_halt(
+            config, keys, initializer, deadline, g=g, order=order
+        )
+        return cls(built_config, config)
+
+    @classmethod
+    def from_loaded(
+        cls,
+        loaded: LoadedConfig,
+        initializer: Initializer,
+        keys: Optional[Keyset] = None,
+        validate: bool = True,
+        timeout: Optional[float] = None,
+    ):
+        """Creates a system from the result of `loaders.load`, using the
+        recorded refs for the dependency graph and ref expansion rather
+        than walking the config again.  The config is validated first, and
+        `timeout` and halting on failure work as in `from_config`.
+        """
+        config, g = loaded.config, loaded.graph
+        if validate:
+            check(config, initializer, keys, g)
+        keys = (
+            config.keys()
+            if keys is None
+            else frozenset(dependent_keys(config, keys, g))
+        )
+        deadline = None if timeout is None else Deadline(timeout)
+        built_config = build_or_halt(
+            config, keys, initializer, deadline, g=g, ref_paths=loaded.ref_paths
+        )
+        return cls(built_config, config)
+
+    def halt(self, initializer: Initializer):
+        """Halts every component, dependents before their dependencies"""
+        components, config = self._state()
+        halt_components(initializer, halt_order(components, config, components.keys()))
+
+    def footprint(self) -> Footprint:
+        """Reports the memory held by each component (see `footprint.Footprint`)"""
+        return footprint(*self._state(), self._allocations)
+
+    def release_original_config(self):
+        """Drops the system's copy of its config to free its memory.
+        Afterwards the system can no longer be rebuilt with overrides.
+        """
+        self._original_config = None
+
+    @require(lambda self: self._original_config is not None)
+    def with_overrides(
+        self,
+        overrides: Mapping[Key, Any],
+        initializer: Initializer,
+        validate: bool = True,
+        timeout: Optional[float] = None,
+    ):
+        """Derives a new system in which the components for the keys in
+        `overrides` are replaced by the given (already built) values.
+
+        Only the keys which depend on an overridden key, directly or
+        transitively, are initialized again; every other component is
+        shared with this system.  Validation, `timeout` and halting on
+        failure work as in `from_config`.
+        """
+        built_config, config = self._override_components(
+            overrides, initializer, validate, timeout
+        )
+        return type(self)(built_config, config)
+
+    @require(lambda self: self._original_config is not None)
+    def _override_components(
+        self,
+        overrides: Mapping[Key, Any],
+        initializer: Initializer,
+        validate: bool = True,
+        timeout: Optional[float] = None,
+    ) -> tuple[SystemMap, SystemMap]:
+        """The components rebuilt with overrides, and their config"""
+        components, config = self._state()
+        g = dependency_graph(config)
+        stale = transitive_dependents_set(g, overrides.keys())
+        seed = pmap({k: v for k, v in components.items() if k not in stale}).update(
+            overrides
+        )
+        if validate:
+            check(
+                config,
+                initializer,
+                [k for k in components.keys() if k in config],
+                g,
+                built=seed.keys(),
+            )
+        built_config = build_or_halt(
+            config,
+            components.keys(),
+            initializer,
+            None if timeout is None else Deadline(timeout),
+            system=seed,
+            g=g,
+        )
+        return built_config, config
+
+
+class ConcurrentSystem(System):
+    """A system whose components can be swapped while other threads use it.
+
+    Components are held in a single immutable map which is replaced
+    wholesale on every change, so readers never lock and never see a
+    half-updated system.  A reader which needs several components from the
+    same version should take `components` once and read from that.
+
+    The components of an old version which the new one no longer uses are
+    halted once no reader holds the old table any more, ie when it is freed
+    by the garbage collector.
+    """
+
+    __slots__ = ("_write_lock", "_version")
+
+    def __new__(cls, built_config: SystemMap, original_config: SystemMap):
+        # no per-key slots: every read goes through the current table, and
+        # `components` is that table
+        return object.__new__(cls)
+
+    def __init__(self, built_config: SystemMap, original_config: SystemMap):
+        # the table and its config are published together, as one tuple
+        self._version = (pmap(built_config), original_config)
+        self._allocations = pmap()
+        self._write_lock = threading.Lock()
+
+    @property
+    def _table(self) -> SystemMap:  # type: ignore[override]
+        return self._version[0]
+
+    @property
+    def _original_config(self) -> Optional[SystemMap]:  # type: ignore[override]
+        return self._version[1]
+
+    def _state(self) -> tuple[SystemMap, Optional[SystemMap]]:
+        return self._version
+
+    def release_original_config(self):
+        with self._write_lock:
+            self._version = (self._table, None)
+
+    def swap(
+        self,
+        overrides: Mapping[Key, Any],
+        initializer: Initializer,
+        timeout: Optional[float] = None,
+    ):
+        """Replaces the components for the keys in `overrides`, rebuilding
+        their dependents (as `with_overrides`), and publishes the result in
+        one step.  Returns the new component table.
+        """
+        with self._write_lock:
+            version = self._override_components(overrides, initializer, timeout=timeout)
+            return self._publish(version, initializer)
+
+    def reload(
+        self,
+        config: SystemMap,
+        initializer: Initializer,
+        keys: Optional[Keyset] = None,
+        timeout: Optional[float] = None,
+    ):
+        """Builds a complete new version of the system from `config` (as
+        `from_config`) and publishes it in one step.  Returns the new
+        component table.
+        """
+        with self._write_lock:
+            fresh = System.from_config(config, initializer, keys, timeout=timeout)
+            return self._publish(fresh._state(), initializer)
+
+    def _publish(
+        self,
+        version: tuple[SystemMap, Optional[SystemMap]],
+        initializer: Initializer,
+    ) -> SystemMap:
+        """Makes version current, arranging for the components of the old
+        version which it doesn't share to be halted once the old table is
+        freed.  Returns the new table."""
+        old_table, old_config = self._version
+        table = pmap(version[0])
+        self._version = (table, version[1])
+        superseded = [
+            k for k, v in old_table.items() if k not in table or table[k] is not v
+        ]
+        if superseded:
+            weakref.finalize(
+                old_table,
+                halt_components,
+                initializer,
+                halt_order(old_table, old_config, superseded),
+            )
+        return table
+
+
+class WarmSystem(System):
+    """A system which is returned as soon as its critical components are
+    built, while the rest (the deferred components) are built in the
+    background.
+
+    Reading a deferred component blocks until it is built.  `future(key)`
+    gives the future for a deferred component, and `warmup` a future which
+    completes with the system once every deferred component is built (or
+    fails with the first build error), eg for health checks.
+    """
+
+    __slots__ = ("_futures", "_warmup")
+
+    def __new__(cls, built_config: SystemMap, original_config: SystemMap):
+        # no per-key slots, so that deferred components can be published
+        # by replacing the table
+        return object.__new__(cls)
+
+    def __init__(self, built_config: SystemMap, original_config: SystemMap):
+        super().__init__(built_config, original_config)
+        self._futures = pmap()
+        self._warmup = Future()
+        self._warmup.set_result(self)
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ("_table", "_futures"):
+            raise AttributeError(name)
+        table = self._table
+        if name in table:
+            return table[name]
+        elif name in self._futures:
+            return self._futures[name].result()
+        else:
+            raise AttributeError(name)
+
+    def __dir__(self):
+        return [*super().__dir__(), *self._futures.keys()]
+
+    @property
+    def warmup(self) -> Future:
+        """A future which completes with the system when it is fully built"""
+        return self._warmup
+
+    def future(self, key: Key) -> Future:
+        """A future for the component built for key"""
+        if key in self._futures:
+            return self._futures[key]
+        components = self.components
+        if key not in components:
+            raise KeyError(f"No component for key {key!r}")
+        result: Future = Future()
+        result.set_result(components[key])
+        return result
+
+    @classmethod
+    def from_config(
+        cls,
+        config: SystemMap,
+        initializer: Initializer,
+        keys: Optional[Keyset] = None,
+        ref_selector: Callable[[Any], bool] = default_ref_selector,
+        transform: Callable[[Any], bool] = default_ref_transform,
+        trace_allocations: bool = False,
+        validate: bool = True,
+        timeout: Optional[float] = None,
+        timings: Optional[MutableMapping[Key, float]] = None,
+        critical: Optional[Keyset] = None,
+    ):
+        """As `System.from_config`, but only the `critical` keys and their
+        dependencies are built before returning; the remaining keys are
+        built in a background thread.  If `critical` is None every key is
+        critical; otherwise each critical key must be among the keys to
+        build, or `validation.ConfigError` is raised.  `timeout`, `trace_allocations` and
+        `timings` only apply to the critical components.
+        """
+        original_config = replace_refs(config, ref_selector, transform)
+        if validate:
+            check(original_config, initializer, keys)
+        all_keys = dependent_keys(
+            original_config, original_config.keys() if keys is None else keys
+        )
+        if critical is not None:
+            wanted = frozenset(all_keys)
+            outside = sorted(k for k in critical if k not in wanted)
+            if outside:
+                raise ConfigError(
+                    [
+                        f"Critical key {k} is not among the keys to build"
+                        for k in outside
+                    ]
+                )
+        result = super().from_config(
+            original_config,
+            initializer,
+            keys if critical is None else critical,
+            ref_selector,
+            transform,
+            trace_allocations,
+            validate=False,
+            timeout=timeout,
+            timings=timings,
+        )
+        deferred = [k for k in all_keys if k not in result.components]
+        if deferred:
+            result._start_warmup(original_config, all_keys, deferred, initializer)
+        return result
+
+    def _start_warmup(
+        self,
+        config: SystemMap,
+        keys: Keyset,
+        deferred: Iterable[Key],
+        initializer: Initializer,
+    ):
+        futures = pmap({k: Future() for k in deferred})
+        self._futures = futures
+        self._warmup = Future()
+
+        def publishing(f: Callable[[Key, Any], Any]) -> Callable[[Key, Any], Any]:
+            def publish(k: Key, v: Any) -> Any:
+                component = f(k, v)
+                futures[k].set_result(component)
+                return component
+
+            return publish
+
+        def warm():
+            try:
+                built = build_or_halt(
+                    config, keys, initializer, system=self._table, wrap=publishing
+                )
+            except BaseException as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                self._warmup.set_exception(e)
+            else:
+                self._table = built
+                self._warmup.set_result(self)
+
+        threading.Thread(target=warm, daemon=True, name="pyntegrant-warmup").start()
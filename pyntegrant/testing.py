@@ -0,0 +1,38 @@
+"""Helpers for using systems in test suites.
+
+These need pytest, which is not a dependency of pyntegrant itself.
+"""
+from typing import Optional
+
+from pyntegrant.initializer import Initializer
+from pyntegrant.map import Keyset, SystemMap
+from pyntegrant.system import System
+
+
+def system_fixture(
+    config: SystemMap,
+    initializer: Initializer,
+    keys: Optional[Keyset] = None,
+    scope: str = "session",
+):
+    """Creates a pytest fixture which builds the system once per `scope`
+    and halts it (see `System.halt`) when the scope ends.
+
+    Assign the result to a name in a conftest or test module; tests can
+    then derive systems with fakes swapped in via `System.with_overrides`
+    without paying for a full build each time:
+
+        base_system = system_fixture(config, initializer())
+
+        def test_thing(base_system):
+            system = base_system.with_overrides({"db": FakeDb()}, initializer())
+    """
+    import pytest
+
+    @pytest.fixture(scope=scope)
+    def fixture():
+        system = System.from_config(config, initializer, keys)
+        yield system
+        system.halt(initializer)
+
+    return fixture
@@ -0,0 +1,142 @@
+"""Checks on a config and initializer which can be run before building,
+so that every problem is reported at once rather than one at a time from
+the middle of a build
+"""
+import inspect
+from typing import Any, Iterable, Mapping, Optional
+
+import networkx as nx
+from networkx import DiGraph
+
+from pyntegrant.initializer import Initializer
+from pyntegrant.map import (
+    Key,
+    Keyset,
+    SystemMap,
+    dependency_graph,
+    find_refs,
+    transitive_dependencies_set,
+)
+
+
+class ConfigError(ValueError):
+    """Raised by `check` with every problem found in a config"""
+
+    def __init__(self, errors: list[str]):
+        self.errors = errors
+        super().__init__(
+            f"{len(errors)} problem(s) found in config:\n"
+            + "\n".join(f"  {e}" for e in errors)
+        )
+
+
+def missing_ref_errors(
+    config: SystemMap, keys: Iterable[Key], g: Optional[DiGraph] = None
+) -> list[str]:
+    """Refs anywhere in the values of `keys` which don't resolve to a key.
+    The config's dependency graph is used to find refs, if given."""
+    return [
+        f"{k} refers to missing key {ref}"
+        for k in keys
+        for ref in sorted(
+            find_refs(config[k]) if g is None else (g.successors(k) if k in g else ())
+        )
+        if ref not in config
+    ]
+
+
+def cycle_errors(g: DiGraph) -> list[str]:
+    """One cycle, as a full path, for each group of keys which depend on
+    each other"""
+    cycles = (
+        nx.find_cycle(g.subgraph(component))
+        for component in nx.strongly_connected_components(g)
+        if len(component) > 1 or nx.number_of_selfloops(g.subgraph(component)) > 0
+    )
+    return [
+        "dependency cycle: " + " -> ".join([a for a, _ in cycle] + [cycle[0][0]])
+        for cycle in cycles
+    ]
+
+
+def handler_errors(
+    config: SystemMap, keys: Iterable[Key], initializer: Initializer
+) -> list[str]:
+    """Keys with no handler, or whose value can't be passed to their
+    handler in the way `Initializer.initialize` will pass it"""
+    return [
+        error
+        for k in keys
+        for error in [handler_error(k, config[k], initializer)]
+        if error is not None
+    ]
+
+
+def handler_error(key: Key, value: Any, initializer: Initializer) -> Optional[str]:
+    """The problem, if any, with initializing key from value"""
+    registered = initializer.registered_key(initializer.handlers, key)
+    if registered is not None:
+        handler = initializer.handlers[registered]
+        args, kwargs = ((), value) if isinstance(value, Mapping) else ((value,), {})
+    elif initializer.default_handler is not None:
+        handler = initializer.default_handler
+        args, kwargs = (value,), {}
+    else:
+        return f"No handler found for key {key}"
+    try:
+        signature = inspect.signature(handler)
+    except (TypeError, ValueError):
+        # builtins and the like may have no signature to check against
+        return None
+    try:
+        signature.bind(*args, **kwargs)
+    except TypeError as e:
+        name = getattr(handler, "__name__", repr(handler))
+        return f"{key} does not match its handler {name}{signature}: {e}"
+    return None
+
+
+def validate(
+    config: SystemMap,
+    initializer: Optional[Initializer] = None,
+    keys: Optional[Keyset] = None,
+    g: Optional[DiGraph] = None,
+    built: Keyset = frozenset(),
+) -> list[str]:
+    """Returns every problem found in the config which would stop `keys`
+    (by default all keys) and their dependencies from being built: missing
+    refs, dependency cycles and, given an initializer, missing handlers and
+    values which don't fit their handler's signature.
+
+    `g` is the config's dependency graph, if already known.  Handlers are
+    not checked for keys in `built`, which are already built.
+    """
+    g = dependency_graph(config) if g is None else g
+    keys = config.keys() if keys is None else keys
+    relevant_keys = sorted(
+        k
+        for k in frozenset(keys).union(transitive_dependencies_set(g, keys))
+        if k in config
+    )
+    errors = [
+        *(f"Key {k} is not in the config" for k in keys if k not in config),
+        *missing_ref_errors(config, relevant_keys, g),
+        *cycle_errors(g.subgraph(relevant_keys)),
+    ]
+    if initializer is not None:
+        unbuilt = [k for k in relevant_keys if k not in built]
+        errors.extend(handler_errors(config, unbuilt, initializer))
+    return errors
+
+
+def check(
+    config: SystemMap,
+    initializer: Optional[Initializer] = None,
+    keys: Optional[Keyset] = None,
+    g: Optional[DiGraph] = None,
+    built: Keyset = frozenset(),
+):
+    """Raises ConfigError listing every problem found by `validate`"""
+    errors = validate(config, initializer, keys, g, built)
+    if errors:
+        raise ConfigError(errors)
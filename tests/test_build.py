@@ -1,15 +1,26 @@
+import gc
+import pickle
+import threading
+
 import pytest
 
 from pyntegrant.initializer import Initializer
 from pyntegrant.loaders import (
     from_json,
     from_jsons,
+    from_snapshot,
     from_toml,
     from_tomls,
+    load,
     replace_refs,
+    to_snapshot,
 )
-from pyntegrant.map import PRef, build
-from pyntegrant.system import System
+from pyntegrant.map import PRef, build, dependency_graph
+from pyntegrant.system import ConcurrentSystem, System, WarmSystem
+from pyntegrant.testing import system_fixture
+from pyntegrant.validation import ConfigError
+
+pytest_plugins = ["pytester"]
 
 quad_config = dict(
     numerator=dict(minuend=PRef("bsqr"), subtrahend=PRef("ac4")),
@@ -146,6 +157,175 @@ def test_load_toml(config, expected):
     test_build(from_tomls(config), expected)
 
 
+@pytest.mark.parametrize("config, expected", [(quad_config_json, 4)])
+def test_load_snapshot(config, expected, tmp_path):
+    path = str(tmp_path / "config.snapshot")
+    to_snapshot(from_jsons(config), path)
+    with from_snapshot(path) as snapshot:
+        assert snapshot.config == from_jsons(config)
+        assert snapshot.order[-1] in ("bsqr", "ac4", "denominator")
+        system = System.from_snapshot(snapshot, initializer())
+        assert system.result == expected
+        system = System.from_snapshot(snapshot, initializer(), {"numerator"})
+        assert system.numerator == 8
+        assert not hasattr(system, "result")
+    assert snapshot._buffer.closed
+
+
+def test_load_tags(tmp_path, monkeypatch):
+    include = tmp_path / "ac4.json"
+    include.write_text('{ "a" : "#p/env A_VALUE", "c" : 2 }')
+    monkeypatch.setenv("A_VALUE", "1")
+    config = dict(quad_config_tobuild, ac4=f"#p/include {include}")
+    loaded = load(config)
+    assert loaded.config["ac4"] == dict(a="1", c=2)
+    assert loaded.ref_paths["numerator"] == (
+        (("minuend",), PRef("bsqr")),
+        (("subtrahend",), PRef("ac4")),
+    )
+    assert "bsqr" not in loaded.ref_paths
+    assert set(loaded.graph.edges) == set(
+        dependency_graph(replace_refs(quad_config_tobuild)).edges
+    )
+
+    i = initializer()
+    i.register("ac4")(lambda a, c: int(a) * c * 4)
+    system = System.from_loaded(loaded, i)
+    assert system.result == 4
+
+
+def test_load_unknown_tag():
+    with pytest.raises(ValueError):
+        load(dict(a="#p/nonesuch x"))
+
+
+quad_system = system_fixture(quad_config, initializer())
+
+
+def test_with_overrides(quad_system):
+    built = []
+    i = initializer()
+    initialize = i.initialize
+    i.initialize = lambda k, v, deadline=None: built.append(k) or initialize(k, v)
+    system = quad_system.with_overrides({"ac4": 0}, i)
+    assert sorted(built) == ["numerator", "result"]
+    assert system.result == 8
+    assert system.ac4 == 0
+    assert system.bsqr is quad_system.bsqr
+    assert quad_system.result == 4
+
+
+def test_system_fixture_halts(pytester):
+    pytester.makepyfile(
+        """
+        from pyntegrant.initializer import Initializer
+        from pyntegrant.testing import system_fixture
+
+        halted = []
+        i = Initializer()
+        i.register_default()(lambda v: v)
+        i.register_halt("db")(halted.append)
+        db_system = system_fixture({"db": "db://"}, i, scope="function")
+
+        def test_uses(db_system):
+            assert db_system.db == "db://"
+            assert halted == []
+
+        def test_halted():
+            assert halted == ["db://"]
+        """
+    )
+    pytester.runpytest().assert_outcomes(passed=2)
+
+
+def test_concurrent_swap():
+    i = initializer()
+    system = ConcurrentSystem.from_config(quad_config, i)
+    stop = threading.Event()
+    inconsistent = []
+
+    def read():
+        while not stop.is_set():
+            c = system.components
+            if c["result"] != (c["bsqr"] - c["ac4"]) / c["denominator"]:
+                inconsistent.append(c)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for ac4 in range(50):
+        system.swap({"ac4": ac4}, i)
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert inconsistent == []
+    assert system.ac4 == 49
+    assert system.result == (16 - 49) / 2
+
+    halted = []
+    for key in quad_config:
+        i.register_halt(key)(lambda v, key=key: halted.append(key))
+    system.swap({"ac4": 0}, i)
+    assert halted == ["result", "numerator", "ac4"]
+    halted.clear()
+
+    # a reader still holding the old table keeps its components up
+    old = system.components
+    system.reload(quad_config, i)
+    assert system.result == 4
+    assert halted == []
+    assert old["result"] == (16 - 0) / 2
+    del old
+    gc.collect()
+    # denominator and bsqr are rebuilt to the very same objects, so stay up
+    assert sorted(halted) == ["ac4", "numerator", "result"]
+    assert halted[0] == "result"
+
+
+def test_concurrent_reload_without_config():
+    i = initializer()
+    halted = []
+    for key in quad_config:
+        i.register_halt(key)(lambda v, key=key: halted.append(key))
+    system = ConcurrentSystem.from_config(quad_config, i)
+    system.release_original_config()
+    system.reload(dict(quad_config, bsqr=5), i)
+    gc.collect()
+    assert system.bsqr == 25
+    assert system.footprint().total > 0
+    # ac4 and denominator are rebuilt to the very same objects
+    assert sorted(halted) == ["bsqr", "numerator", "result"]
+
+
+def test_system_layout():
+    i = initializer()
+    system = System.from_config(quad_config, i)
+    assert isinstance(system, System)
+    assert not hasattr(system, "__dict__")
+    assert "result" in dir(system)
+    assert type(System.from_config(quad_config, i)) is type(system)
+
+    config = replace_refs({"worker-0": "w", "result": "#p/ref worker-0"})
+    system = System.from_config(config, initializer_with_default())
+    assert system.components["worker-0"] == "w"
+    assert getattr(system, "worker-0") == "w"
+    assert system.result == "W"
+    with pytest.raises(AttributeError):
+        system.nonesuch
+    assert pickle.loads(pickle.dumps(system)).result == "W"
+
+
+@pytest.mark.parametrize("key", ["components", "footprint", "_layout_slots"])
+def test_system_layout_reserved_names(key):
+    config = replace_refs({key: "w", "result": f"#p/ref {key}"})
+    system = System.from_config(config, initializer_with_default())
+    assert system.components[key] == "w"
+    assert system.result == "W"
+    assert system.footprint().components.keys() == {key, "result"}
+    assert system.with_overrides({key: "v"}, initializer_with_default()).result == "V"
+
+
 def initializer_with_default():
 
     result = Initializer()
@@ -166,3 +346,130 @@ def test_initializer_with_default():
     i = initializer_with_default()
     system = build(config, {"result"}, i.initialize)
     assert system["result"] == "FOO"
+
+
+def test_from_tenants():
+    built = []
+    i = initializer()
+    initialize = i.initialize
+    i.initialize = lambda k, v, deadline=None: built.append(k) or initialize(k, v)
+    tenants = {"a": {"ac4": dict(a=1, c=1)}, "b": {"denominator": 2}}
+    systems = System.from_tenants(quad_config, tenants, i, {"bsqr"}, timeout=5)
+    assert systems["a"].result == (16 - 4) / 2
+    assert systems["b"].result == (16 - 8) / 4
+    assert systems["a"].bsqr is systems["b"].bsqr
+    assert sorted(built) == sorted(
+        ["bsqr"] + ["ac4", "denominator", "numerator", "result"] * 2
+    )
+    with pytest.raises(ValueError):
+        System.from_tenants(quad_config, tenants, i, shared={"numerator"})
+
+    # shared keys are validated even when there are no tenants
+    built.clear()
+    with pytest.raises(ConfigError):
+        System.from_tenants(dict(quad_config, bsqr=PRef("nope")), {}, i, {"bsqr"})
+    assert built == []
+
+
+def test_warm_system():
+    i = initializer()
+    release = threading.Event()
+    numerator = i.handlers["numerator"]
+    i.register("numerator")(lambda **kw: release.wait(5) and numerator(**kw))
+    ready = []
+    called = threading.Event()
+
+    system = WarmSystem.from_config(quad_config, i, critical={"denominator", "bsqr"})
+    assert system.denominator == 2
+    assert not system.future("result").done()
+    system.warmup.add_done_callback(lambda f: (ready.append(f.result()), called.set()))
+    threading.Timer(0.1, release.set).start()
+    assert system.result == 4
+    assert system.warmup.result(5) is system
+    # done-callbacks run after waiters are woken, so wait for ours too
+    assert called.wait(5)
+    assert ready == [system]
+    assert system.components["result"] == 4
+    assert system.future("bsqr").result() == 16
+    with pytest.raises(KeyError, match="No component for key 'nope'"):
+        system.future("nope")
+
+
+def test_warm_system_checks_critical_keys():
+    i = initializer()
+    with pytest.raises(ConfigError) as e:
+        WarmSystem.from_config(
+            quad_config, i, {"numerator"}, critical={"nope", "result"}
+        )
+    assert e.value.errors == [
+        "Critical key nope is not among the keys to build",
+        "Critical key result is not among the keys to build",
+    ]
+
+
+def test_warm_system_failure():
+    i = initializer()
+    i.register("numerator")(lambda **kw: 1 / 0)
+    system = WarmSystem.from_config(quad_config, i, critical={"bsqr"})
+    assert system.bsqr == 16
+    with pytest.raises(ZeroDivisionError):
+        system.result
+    with pytest.raises(ZeroDivisionError):
+        system.warmup.result(5)
+
+
+def test_load_templates():
+    config = {
+        "db": "postgres://",
+        "worker-{n}": {
+            "#p/range": [3],
+            "shard": "{n}",
+            "name": "w{n}",
+            "db": "#p/ref db",
+            "opts": {"retries": [1, 2]},
+        },
+        "chain-{region}": {"#p/each": ["us", "eu"], "worker": "#p/ref worker-1"},
+        "pool": {"workers": ["#p/ref worker-0", "#p/ref worker-2"]},
+    }
+    loaded = load(config)
+    assert len(loaded.config) == 7
+    assert loaded.config["worker-2"] == {
+        "shard": 2,
+        "name": "w2",
+        "db": PRef("db"),
+        "opts": {"retries": [1, 2]},
+    }
+    # untouched parts of the body are shared between instances
+    assert loaded.config["worker-0"]["opts"] is loaded.config["worker-1"]["opts"]
+    assert loaded.ref_paths["chain-eu"] == ((("worker",), PRef("worker-1")),)
+    assert set(loaded.graph.edges) == set(dependency_graph(loaded.config).edges)
+
+    i = Initializer()
+    i.register_default()(lambda v: v)
+    i.register("worker-{n}", template=True)(
+        lambda shard, name, db, opts: (shard, name, db)
+    )
+    i.register("pool")(lambda workers: workers)
+    halted = []
+    i.register_halt("worker-{n}", template=True)(halted.append)
+    system = System.from_loaded(loaded, i)
+    assert system.pool == [(0, "w0", "postgres://"), (2, "w2", "postgres://")]
+    assert system.components["chain-us"] == {"worker": (1, "w1", "postgres://")}
+    system.halt(i)
+    assert sorted(halted) == [(n, f"w{n}", "postgres://") for n in range(3)]
+
+
+@pytest.mark.parametrize(
+    "config, message",
+    [
+        (
+            {"w-{n}": {"#p/range": [2]}, "w-{m}": {"#p/each": [1]}},
+            r"duplicate keys \['w-1'\]",
+        ),
+        ({"w-{n}": {"#p/range": [2]}, "w-0": 1}, r"duplicate keys \['w-0'\]"),
+        ({"w-{a}-{b}": {"#p/range": [2]}}, "exactly one placeholder, not 2"),
+    ],
+)
+def test_load_template_errors(config, message):
+    with pytest.raises(ValueError, match=message):
+        load(config)
@@ -0,0 +1,67 @@
+import io
+import json
+
+from networkx import DiGraph
+
+from pyntegrant.export import graph_metrics, levels, timed, write_dot, write_json
+from pyntegrant.initializer import Initializer
+from pyntegrant.map import PRef, build, dependency_graph
+from pyntegrant.system import System
+
+config = dict(
+    db=1,
+    cache=2,
+    users=dict(db=PRef("db"), cache=PRef("cache")),
+    orders=dict(db=PRef("db")),
+    api=dict(users=PRef("users"), orders=PRef("orders")),
+)
+
+
+def test_levels_and_metrics():
+    g = dependency_graph(config)
+    assert levels(g) == dict(db=0, cache=0, users=1, orders=1, api=2)
+    metrics = graph_metrics(g, n_hotspots=1)
+    assert metrics.depth == 3
+    assert metrics.widths == (2, 2, 1)
+    assert metrics.max_parallelism == 2
+    assert metrics.hotspots == (("db", 2),)
+
+
+def test_export():
+    g = dependency_graph(config)
+    timings: dict = {}
+    build(config, config.keys(), timed(lambda k, v: k, timings))
+    assert set(timings) == set(config)
+
+    out = io.StringIO()
+    write_json(g, out, timings, levels(g))
+    exported = json.loads(out.getvalue())
+    assert {n["id"]: n["level"] for n in exported["nodes"]} == levels(g)
+    assert all("seconds" in n for n in exported["nodes"])
+    assert sorted(map(tuple, exported["edges"])) == sorted(g.edges)
+
+    out = io.StringIO()
+    write_dot(g, out, timings, levels(g))
+    dot = out.getvalue()
+    assert dot.startswith("digraph")
+    assert '"api" -> "users";' in dot
+    assert '"api" [label="api\\n' in dot
+    assert '"db" [label="db\\n%.1fms\\nlevel 0"];' % (timings["db"] * 1000) in dot
+
+
+def test_dot_quoting():
+    g = DiGraph([('a "b"\\c\nd', "ü")])
+    out = io.StringIO()
+    write_dot(g, out)
+    assert '  "a \\"b\\"\\\\c\\nd" [label="a \\"b\\"\\\\c\\nd"];' in out.getvalue()
+    assert '  "ü" [label="ü"];' in out.getvalue()
+    assert '\\nd" -> "ü";' in out.getvalue()
+
+
+def test_from_config_timings():
+    i = Initializer()
+    i.register_default()(lambda v: v)
+    timings: dict = {}
+    System.from_config(config, i, timings=timings, trace_allocations=True)
+    assert set(timings) == set(config)
+    assert all(t >= 0 for t in timings.values())
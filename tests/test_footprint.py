@@ -0,0 +1,43 @@
+import sys
+
+from pyntegrant.footprint import deep_sizeof
+from pyntegrant.initializer import Initializer
+from pyntegrant.map import PRef
+from pyntegrant.system import System
+
+
+def test_deep_sizeof_counts_shared_once():
+    shared = list(range(100))
+    seen: set[int] = set()
+    first = deep_sizeof([shared], seen)
+    second = deep_sizeof([shared], seen)
+    assert first > sys.getsizeof(shared)
+    assert second == sys.getsizeof([shared])
+
+
+def initializer() -> Initializer:
+    i = Initializer()
+
+    @i.register("table")
+    def _(size):
+        return [str(n) for n in range(size)]
+
+    @i.register("index")
+    def _(table):
+        return {"table": table}
+
+    return i
+
+
+def test_footprint():
+    config = dict(table=1000, index=dict(table=PRef("table")))
+    system = System.from_config(config, initializer(), trace_allocations=True)
+    report = system.footprint()
+    # the index only holds a reference to the table, which is charged to "table"
+    assert report.components["table"] > 10 * report.components["index"]
+    assert report.allocations["table"] > 0
+    assert report.original_config > 0
+    assert report.total > report.components["table"]
+
+    system.release_original_config()
+    assert system.footprint().original_config == 0
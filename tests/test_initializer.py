@@ -1,6 +1,9 @@
+import threading
+
 import pytest
 
 from pyntegrant.initializer import Initializer
+from pyntegrant.policy import BuildTimeout
 
 i = Initializer()
 
@@ -33,3 +36,27 @@ def _(dividend, divisor):
 def test_initializer(key, arg, expected):
     f = i.initialize
     assert f(key, arg) == expected
+
+
+def test_template_handlers():
+    t = Initializer()
+    t.register_default()(lambda v: ("default", v))
+    t.register("a{b}")(lambda v: ("a{b}", v))
+    t.register("w-{n}", timeout=0.01, template=True)(lambda v: ("w-{n}", v))
+    t.register("w-1")(lambda v: ("w-1", v))
+    # only registrations marked as templates match other keys
+    assert t.initialize("abc", 1) == ("default", 1)
+    assert t.initialize("w-0", 2) == ("w-{n}", 2)
+    assert t.initialize("w-1", 3) == ("w-1", 3)
+
+    # an instance with its own handler doesn't inherit the template's timeout
+    t.register("w-{n}", timeout=0.01, template=True)(lambda v: v.wait())
+    t.register("w-1")(lambda v: v.wait(0.05) or "w-1")
+    event = threading.Event()
+    assert t.initialize("w-1", event) == "w-1"
+    with pytest.raises(BuildTimeout):
+        t.initialize("w-0", event)
+    event.set()
+
+    with pytest.raises(ValueError):
+        t.register("worker", template=True)
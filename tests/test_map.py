@@ -1,3 +1,4 @@
+import copy
 import pprint
 
 import networkx as nx
@@ -14,6 +15,13 @@ from pyntegrant.map import (
 )
 
 
+def test_pref_interned():
+    assert PRef("a") is PRef(key="a")
+    assert PRef("a") is not PRef("b")
+    assert copy.deepcopy(PRef("a")) is PRef("a")
+    assert not hasattr(PRef("a"), "__dict__")
+
+
 def test_dependency_graph():
     m = dict(a=dict(arg1=1, arg2=PRef("b")), b=PRef("c"), c=1)
     g = dependency_graph(m)
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from pyntegrant.initializer import Initializer
+from pyntegrant.map import PRef
+from pyntegrant.policy import BuildTimeout, Deadline, RetryPolicy
+from pyntegrant.system import System, build_or_halt
+
+config = dict(
+    db=dict(url="db://"),
+    cache=dict(size=10, db=PRef("db")),
+    server=dict(db=PRef("db"), cache=PRef("cache")),
+)
+
+
+def initializer(log: list, db_failures: int = 0, cache_timeout=None) -> Initializer:
+    i = Initializer()
+    attempts = []
+
+    @i.register("db", retry=RetryPolicy(attempts=3, backoff=0.001))
+    def _(url):
+        attempts.append(threading.current_thread().name)
+        if len(attempts) <= db_failures:
+            raise ConnectionError(url)
+        log.append("start db")
+        return "db"
+
+    @i.register("cache", timeout=cache_timeout)
+    def _(size, db):
+        log.append("start cache")
+        return "cache"
+
+    @i.register("server")
+    def _(db, cache):
+        log.append("start server")
+        return "server"
+
+    for key in config:
+        i.register_halt(key)(lambda v: log.append(f"halt {v}"))
+
+    i.attempts = attempts  # type: ignore
+    return i
+
+
+def test_retry():
+    log: list = []
+    i = initializer(log, db_failures=2)
+    system = System.from_config(config, i)
+    assert system.server == "server"
+    # with no timeout of its own, a handler runs in the calling thread
+    assert i.attempts == [threading.current_thread().name] * 3  # type: ignore
+
+    with pytest.raises(ConnectionError):
+        System.from_config(config, initializer(log, db_failures=3))
+
+
+def test_key_timeout_halts_started_components():
+    log: list = []
+    release = threading.Event()
+    halted = threading.Event()
+    i = initializer(log, cache_timeout=0.01)
+    cache = i.handlers["cache"]
+    i.register("cache", timeout=0.01)(
+        lambda size, db: release.wait() and cache(size, db)
+    )
+    i.register_halt("cache")(lambda v: halted.set())
+
+    with pytest.raises(BuildTimeout):
+        System.from_config(config, i)
+    assert log == ["start db", "halt db"]
+
+    # the abandoned handler's component is halted when it finally returns
+    release.set()
+    assert halted.wait(5)
+    assert "start server" not in log
+
+
+def test_deadline():
+    log: list = []
+    now = [0.0]
+    i = initializer(log)
+    db = i.handlers["db"]
+
+    def slow_db(url):
+        now[0] += 10
+        return db(url)
+
+    i.register("db")(slow_db)
+    with pytest.raises(BuildTimeout):
+        build_or_halt(config, config.keys(), i, Deadline(5, clock=lambda: now[0]))
+    assert log == ["start db", "halt db"]
+    # with a deadline, handlers run in a worker thread
+    assert i.attempts == ["pyntegrant-db"]  # type: ignore
+
+
+def test_deadline_bounds_blocked_handler():
+    log: list = []
+    release = threading.Event()
+    halted = threading.Event()
+    i = initializer(log)
+    cache = i.handlers["cache"]
+    i.register("cache")(lambda size, db: release.wait() and cache(size, db))
+    i.register_halt("cache")(lambda v: halted.set())
+
+    with pytest.raises(BuildTimeout):
+        System.from_config(config, i, timeout=0.05)
+    assert log == ["start db", "halt db"]
+    release.set()
+    assert halted.wait(5)
+
+
+@pytest.mark.parametrize("kwargs", [dict(attempts=0), dict(backoff=-1)])
+def test_invalid_retry_policy(kwargs):
+    with pytest.raises(ValueError):
+        RetryPolicy(**kwargs)
+
+
+def test_halt():
+    log: list = []
+    system = System.from_config(config, initializer(log))
+    system.halt(initializer(log))
+    assert log[-3:] == ["halt server", "halt cache", "halt db"]
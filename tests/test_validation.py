@@ -0,0 +1,136 @@
+import functools
+
+import pytest
+
+from pyntegrant.initializer import Initializer
+from pyntegrant.loaders import from_snapshot, load, to_snapshot
+from pyntegrant.map import PRef, all_refs_resolveable
+from pyntegrant.system import System
+from pyntegrant.validation import ConfigError, validate
+
+
+def initializer() -> Initializer:
+    i = Initializer()
+
+    @i.register("server")
+    def _(port, db):
+        assert False, "validation should fail before any handler is called"
+
+    @i.register("db")
+    def _(url):
+        assert False, "validation should fail before any handler is called"
+
+    return i
+
+
+def test_all_refs_resolveable_is_deep():
+    assert not all_refs_resolveable({"a": {"b": [PRef("c")]}})
+    assert all_refs_resolveable({"a": {"b": [PRef("c")]}, "c": 1})
+
+
+@pytest.mark.parametrize(
+    "config, keys, expected",
+    [
+        (
+            {"server": {"port": 80, "db": PRef("db")}, "db": {"url": "x"}},
+            None,
+            [],
+        ),
+        (
+            {"server": {"port": 80, "db": [PRef("db"), PRef("cache")]}},
+            None,
+            ["server refers to missing key cache", "server refers to missing key db"],
+        ),
+        (
+            {"a": PRef("b"), "b": {"c": PRef("c")}, "c": PRef("a"), "d": PRef("d")},
+            {"a"},
+            ["dependency cycle: a -> b -> c -> a"],
+        ),
+    ],
+)
+def test_validate(config, keys, expected):
+    assert validate(config, keys=keys) == expected
+
+
+def test_validate_handlers():
+    config = {"server": {"port": 80, "host": "x", "db": 1}, "db": 1, "cache": 2}
+    assert validate(config, initializer()) == [
+        "No handler found for key cache",
+        "server does not match its handler _(port, db): "
+        "got an unexpected keyword argument 'host'",
+    ]
+
+
+def test_validate_template_handlers():
+    i = Initializer()
+    i.register("w-{n}", template=True)(lambda shard: shard)
+    loaded = load({"w-{n}": {"#p/each": ["a", "b"], "shard": "{n}", "x": 1}})
+    assert validate(loaded.config, i) == [
+        f"w-{n} does not match its handler <lambda>(shard): "
+        "got an unexpected keyword argument 'x'"
+        for n in "ab"
+    ]
+
+
+def test_from_config_reports_all_errors():
+    config = {"server": {"port": 80, "db": PRef("db")}, "cache": PRef("nonesuch")}
+    with pytest.raises(ConfigError) as e:
+        System.from_config(config, initializer())
+    assert e.value.errors == [
+        "cache refers to missing key nonesuch",
+        "server refers to missing key db",
+        "No handler found for key cache",
+    ]
+
+
+class Handler:
+    def __call__(self, a, b):
+        return a + b
+
+
+@pytest.mark.parametrize(
+    "handler, name",
+    [
+        (functools.partial(lambda a, b, c: a + b + c, b=1), "functools.partial"),
+        (Handler(), "Handler object"),
+    ],
+)
+def test_validate_handler_without_name(handler, name):
+    i = Initializer()
+    i.register("x")(handler)
+    [error] = validate({"x": {"a": 1, "d": 2}}, i)
+    assert error.startswith("x does not match its handler")
+    assert name in error
+
+
+def test_other_entry_points_validate(tmp_path):
+    config = {"server": {"port": 80, "db": "#p/ref db"}, "cache": "#p/ref nonesuch"}
+    expected = [
+        "cache refers to missing key nonesuch",
+        "server refers to missing key db",
+        "No handler found for key cache",
+    ]
+    loaded = load(config)
+    with pytest.raises(ConfigError) as e:
+        System.from_loaded(loaded, initializer())
+    assert e.value.errors == expected
+
+    path = str(tmp_path / "config.snapshot")
+    to_snapshot(loaded.config, path)
+    with from_snapshot(path) as snapshot, pytest.raises(ConfigError) as e:
+        System.from_snapshot(snapshot, initializer())
+    assert e.value.errors == expected
+
+
+def test_with_overrides_validates():
+    i = Initializer()
+    i.register("db")(lambda url: url)
+    i.register("server")(lambda db: db)
+    system = System.from_config({"db": {"url": "x"}, "server": PRef("db")}, i)
+    # no handler is needed for a key which is overridden rather than rebuilt
+    del i.handlers["db"]
+    assert system.with_overrides({"db": "fake"}, i).server == "fake"
+    del i.handlers["server"]
+    with pytest.raises(ConfigError) as e:
+        system.with_overrides({"db": "fake"}, i)
+    assert e.value.errors == ["No handler found for key server"]